@@ -1,4 +1,5 @@
 import os
+import tempfile
 import logging
 import sentry_sdk
 from sentry_sdk.integrations.logging import LoggingIntegration
@@ -11,6 +12,29 @@ XATA_DATABASE_URL = os.getenv("XATA_DATABASE_URL")
 DATABASE_URL = XATA_DATABASE_URL or os.getenv("DATABASE_URL", "sqlite:///carpool.db")
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
+# Departure reminders and auto-closing of trips
+# /app is read-only for appuser in Docker and Vercel only allows writes under /tmp
+SCHEDULER_STATE_PATH = os.getenv("SCHEDULER_STATE_PATH", os.path.join(tempfile.gettempdir(), "carpool_scheduler_state.json"))
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "30"))
+TRIP_CLOSE_GRACE_MINUTES = int(os.getenv("TRIP_CLOSE_GRACE_MINUTES", "15"))
+
+# Per-user command throttling
+THROTTLE_RATE_PER_MINUTE = float(os.getenv("THROTTLE_RATE_PER_MINUTE", "20"))
+THROTTLE_BURST = float(os.getenv("THROTTLE_BURST", "10"))
+THROTTLE_COMMAND_RATE_PER_MINUTE = float(os.getenv("THROTTLE_COMMAND_RATE_PER_MINUTE", "6"))
+THROTTLE_COMMAND_BURST = float(os.getenv("THROTTLE_COMMAND_BURST", "3"))
+THROTTLE_NOTICE_COOLDOWN_SECONDS = float(os.getenv("THROTTLE_NOTICE_COOLDOWN_SECONDS", "30"))
+THROTTLE_SHARED_REPLY_TTL_SECONDS = float(os.getenv("THROTTLE_SHARED_REPLY_TTL_SECONDS", "5"))
+
+try:
+    # e.g. "list_trips:3,admin_status:5"; unlisted commands cost 1
+    THROTTLE_COMMAND_COSTS = {
+        name.strip().lower(): float(cost)
+        for name, cost in (item.split(":") for item in filter(None, os.getenv("THROTTLE_COMMAND_COSTS", "list_trips:3,admin_status:5").split(",")))
+    }
+except ValueError:
+    THROTTLE_COMMAND_COSTS = {}
+
 try:
     ADMIN_IDS = list(map(str, filter(None, os.getenv("ADMIN_IDS", "").split(","))))
 except ValueError:
@@ -1,10 +1,11 @@
 import logging
-from telegram.ext import CommandHandler, ContextTypes, CallbackContext, Application
+from telegram.ext import CommandHandler, ContextTypes, CallbackContext, Application, TypeHandler
 from telegram import Update
 from src.services.user import register_user, switch_role, get_user  # Ensure correct relative import
 from src.services.trip import create_trip, get_trip, list_trips  # Ensure correct relative import
 from src.services.admin import get_full_status  # Ensure correct relative import
 from src.config.config import ADMIN_IDS
+from src.handlers.throttle import throttle, coalescer, request_key, share_reply
 from sentry_sdk import capture_exception, new_scope  # Import Sentry's exception capture function and push_scope
 from xata.client import XataClient  # Ensure Xata client is used
 from httpx import Timeout  # Import Timeout for setting request timeouts
@@ -13,6 +14,9 @@ from pprint import pprint
 xata = XataClient()  # Initialize Xata client with a 5-second timeout
 
 def register_handlers(application: Application):
+    application.add_handler(TypeHandler(Update, throttle), group=-1)  # Runs before every command handler
+    share_reply("list_trips")  # Throttled requests may get the reply of an identical in-flight request
+    share_reply("admin_status", lambda user_id: str(user_id) in ADMIN_IDS)
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("switch_role", switch_role_command))
     application.add_handler(CommandHandler("create_trip", create_trip_command))
@@ -106,23 +110,30 @@ async def get_trip_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         capture_exception(e)
         await update.message.reply_text("An error occurred while retrieving the trip. Please try again.")
 
+async def trip_list_reply():
+    """
+    Build the /list_trips reply. Shared by identical concurrent and throttled requests.
+    """
+    trips = await xata.table("trips").get_all()
+    if not trips:
+        return "No trips are currently available."
+    response = "Available Trips:\n"
+    for trip in trips:
+        response += (
+            f"- Trip ID: {trip.get('id', 'Unknown')}, "
+            f"Driver ID: {trip.get('driver_id', 'Unknown')}, "
+            f"Status: {trip.get('status', 'Unknown')}\n"
+        )
+    return response
+
 async def list_trips_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         telegram_id = str(update.effective_user.id)
+        # Join the shared read before the per-user lookup, so no request can miss it
+        response = await coalescer.run(request_key("list_trips", context.args), trip_list_reply)
         user = await xata.table("users").read(telegram_id)
         if user:
-            trips = await xata.table("trips").get_all()
-            if trips:
-                response = "Available Trips:\n"
-                for trip in trips:
-                    response += (
-                        f"- Trip ID: {trip.get('id', 'Unknown')}, "
-                        f"Driver ID: {trip.get('driver_id', 'Unknown')}, "
-                        f"Status: {trip.get('status', 'Unknown')}\n"
-                    )
-                await update.message.reply_text(response)
-            else:
-                await update.message.reply_text("No trips are currently available.")
+            await update.message.reply_text(response)
         else:
             await update.message.reply_text("You are not registered. Use /start to register.")
     except Exception as e:
@@ -146,6 +157,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     await update.message.reply_text(help_text)
 
+async def admin_status_reply():
+    """
+    Build the /admin_status reply. Shared by identical concurrent and throttled requests.
+    """
+    status = await get_full_status()  # Fetch full database status
+    return f"Status:\n{status}"
+
 async def admin_status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Provide a full database status for admin users.
@@ -153,8 +171,8 @@ async def admin_status_command(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         telegram_id = str(update.effective_user.id)  # Xata uses strings for IDs
         if telegram_id in ADMIN_IDS:  # Check if the user's Telegram ID is in ADMIN_IDS
-            status = await xata.db().table("status").get_full()  # Fetch full database status
-            await update.message.reply_text(f"Status:\n{status}")
+            response = await coalescer.run(request_key("admin_status", context.args), admin_status_reply)
+            await update.message.reply_text(response)
         else:
             await update.message.reply_text("You do not have permission to access this command.")
     except Exception as e:
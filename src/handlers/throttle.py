@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import time
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, CallbackContext
+from src.config.config import (
+    THROTTLE_RATE_PER_MINUTE,
+    THROTTLE_BURST,
+    THROTTLE_COMMAND_RATE_PER_MINUTE,
+    THROTTLE_COMMAND_BURST,
+    THROTTLE_NOTICE_COOLDOWN_SECONDS,
+    THROTTLE_SHARED_REPLY_TTL_SECONDS,
+    THROTTLE_COMMAND_COSTS,
+)
+
+logger = logging.getLogger(__name__)
+
+SLOW_DOWN_TEXT = "You're sending commands too quickly. Please wait a moment and try again."
+
+# Commands whose arguments are ignored, so "/list_trips foo" is the same request as "/list_trips"
+ARGLESS_COMMANDS = frozenset({"start", "switch_role", "create_trip", "list_trips", "help", "admin_status", "my_id"})
+
+
+class TokenBuckets:
+    """
+    Token buckets keyed by arbitrary hashable keys.
+
+    Each entry is a (tokens, timestamp) tuple. A bucket that has refilled to
+    capacity is indistinguishable from a missing one, so such entries are
+    swept periodically and memory only grows with currently active users.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float, sweep_interval: float = 60.0, clock=time.monotonic):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._buckets = {}  # key -> (tokens, timestamp)
+        self._clock = clock
+        self._sweep_interval = sweep_interval
+        self._last_sweep = clock()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def tokens(self, key, now: float = None) -> float:
+        now = self._clock() if now is None else now
+        tokens, stamp = self._buckets.get(key, (self.capacity, now))
+        return min(self.capacity, tokens + (now - stamp) * self.rate)
+
+    def consume(self, key, cost: float = 1.0) -> bool:
+        return consume_all([(self, key, cost)])
+
+    def _take(self, key, cost: float, now: float):
+        self._buckets[key] = (self.tokens(key, now) - cost, now)
+        if now - self._last_sweep >= self._sweep_interval:
+            self.sweep(now)
+
+    def sweep(self, now: float = None):
+        now = self._clock() if now is None else now
+        self._last_sweep = now
+        full = [key for key in self._buckets if self.tokens(key, now) >= self.capacity]
+        for key in full:
+            del self._buckets[key]
+
+
+def consume_all(charges: list) -> bool:
+    """
+    Take tokens from several (buckets, key, cost) charges only if all of them can pay.
+    """
+    now = charges[0][0]._clock()
+    if any(buckets.tokens(key, now) < cost for buckets, key, cost in charges):
+        return False
+    for buckets, key, cost in charges:
+        buckets._take(key, cost, now)
+    return True
+
+
+class Coalescer:
+    """
+    Shares the result of an in-flight coroutine between identical concurrent
+    requests, and keeps it for `ttl` seconds after it completes.
+    """
+
+    def __init__(self, ttl: float = 0.0, clock=time.monotonic):
+        self._ttl = ttl
+        self._clock = clock
+        self._in_flight = {}  # key -> asyncio.Task
+        self._recent = {}  # key -> (expires_at, result)
+
+    def _cached(self, key):
+        entry = self._recent.get(key)
+        if entry is not None and entry[0] <= self._clock():
+            del self._recent[key]
+            return None
+        return entry
+
+    def is_in_flight(self, key) -> bool:
+        return key in self._in_flight
+
+    def has(self, key) -> bool:
+        """
+        True if a result for `key` is being computed or still cached.
+        """
+        return key in self._in_flight or self._cached(key) is not None
+
+    def _remember(self, key, task):
+        self._in_flight.pop(key, None)
+        if self._ttl > 0 and not task.cancelled() and task.exception() is None:
+            now = self._clock()
+            for stale in [k for k, (expires, _) in self._recent.items() if expires <= now]:
+                del self._recent[stale]
+            self._recent[key] = (now + self._ttl, task.result())
+
+    async def run(self, key, factory):
+        """
+        Await `factory()` once per key; callers arriving while it runs, or
+        within `ttl` seconds after, get the same result.
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            return entry[1]
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._remember(key, done))
+        return await asyncio.shield(task)
+
+    async def join(self, key):
+        """
+        Return the in-flight or cached result for `key` without starting new work.
+        """
+        entry = self._cached(key)
+        if entry is not None:
+            return entry[1]
+        return await asyncio.shield(self._in_flight[key])
+
+
+user_buckets = TokenBuckets(THROTTLE_RATE_PER_MINUTE / 60.0, THROTTLE_BURST)
+command_buckets = TokenBuckets(THROTTLE_COMMAND_RATE_PER_MINUTE / 60.0, THROTTLE_COMMAND_BURST)
+notice_buckets = TokenBuckets(1.0 / max(THROTTLE_NOTICE_COOLDOWN_SECONDS, 1e-9), 1.0)  # 0 means no cooldown
+coalescer = Coalescer(ttl=THROTTLE_SHARED_REPLY_TTL_SECONDS)
+shared_replies = {}  # command -> callable(user_id) deciding who may receive a shared reply
+
+
+def share_reply(command: str, allowed=lambda user_id: True):
+    """
+    Let throttled requests for `command` be answered with the coalesced reply
+    of an identical request. The command's handler must coalesce its reply
+    text under request_key().
+    """
+    shared_replies[command] = allowed
+
+
+def command_cost(command: str) -> float:
+    # A cost above the burst could never be paid, so it is capped at the bucket capacity
+    return min(THROTTLE_COMMAND_COSTS.get(command, 1.0), THROTTLE_BURST)
+
+
+for _command, _cost in THROTTLE_COMMAND_COSTS.items():
+    if _cost > THROTTLE_BURST:
+        logger.warning(f"Throttle cost {_cost} for /{_command} exceeds THROTTLE_BURST={THROTTLE_BURST}, capping it")
+
+
+def parse_command(text: str):
+    """
+    Split "/cmd@bot arg1 arg2" into ("cmd", ["arg1", "arg2"]), or return (None, []).
+    """
+    if not text or not text.startswith("/"):
+        return None, []
+    parts = text.split()
+    return parts[0][1:].split("@")[0].lower(), parts[1:]
+
+
+def request_key(command: str, args: list = None) -> tuple:
+    """
+    Key identifying identical requests, shared by the throttle and the command handlers.
+    """
+    if command in ARGLESS_COMMANDS:
+        return (command,)
+    return (command, *(args or []))
+
+
+async def throttle(update: Update, context: CallbackContext) -> None:
+    """
+    Runs ahead of the command handlers. Over-limit commands are answered here
+    with the reply of an identical in-flight (or just finished) request when
+    the command shares replies; otherwise they get a cached "slow down" reply
+    at most once per cooldown. Either way the handler does not run.
+    """
+    message = update.effective_message
+    user = update.effective_user
+    if message is None or user is None:
+        return
+    command, args = parse_command(message.text)
+    if command is None:
+        return
+    if consume_all([(user_buckets, user.id, command_cost(command)), (command_buckets, (user.id, command), 1.0)]):
+        return
+    key = request_key(command, args)
+    allowed = shared_replies.get(command)
+    if allowed is not None and allowed(user.id) and coalescer.has(key):
+        try:
+            reply = await coalescer.join(key)
+        except Exception:
+            reply = None  # The shared request failed; its own caller reports the error
+        if reply is not None:
+            await message.reply_text(reply)
+            raise ApplicationHandlerStop
+    logger.info(f"Throttled /{command} from user {user.id}")
+    if notice_buckets.consume(user.id):
+        await message.reply_text(SLOW_DOWN_TEXT)
+    raise ApplicationHandlerStop
@@ -9,6 +9,7 @@ import asyncio
 from xata.client import XataClient  # Import Xata client
 from src.config.config import ADMIN_IDS, TELEGRAM_TOKEN, WEBHOOK_URL, setup_sentry
 from src.handlers.commands import register_handlers
+from src.services.scheduler import start_scheduler, stop_scheduler
 from httpx import Timeout  # Import Timeout for setting request timeouts
 
 # Set up logging
@@ -85,6 +86,10 @@ async def lifespan(app: FastAPI):
         await application.bot.set_webhook(url=WEBHOOK_URL)
         logger.info(f"Webhook set to {WEBHOOK_URL}")
 
+        # Start the departure reminder / auto-close scheduler
+        await start_scheduler(application.bot)
+        logger.info("Trip scheduler started")
+
         yield  # Application runs here
 
     except Exception as e:
@@ -93,6 +98,7 @@ async def lifespan(app: FastAPI):
         raise
     finally:
         # Shutdown: Clean up
+        await stop_scheduler()
         if application:
             logger.info("Stopping application")
             await application.stop()
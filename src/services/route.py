@@ -0,0 +1,278 @@
+import math
+from functools import lru_cache
+from src.utils.time_utils import parse_time
+
+EARTH_RADIUS_KM = 6371.0
+AVERAGE_SPEED_KMH = 40.0
+WINDOW_SLACK_MINUTES = 10.0
+
+
+def haversine_km(a: tuple, b: tuple) -> float:
+    """
+    Great-circle distance in kilometres between two (lat, lon) pairs.
+    """
+    lat1, lon1 = map(math.radians, a)
+    lat2, lon2 = map(math.radians, b)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+@lru_cache(maxsize=256)
+def distance_matrix(coords: tuple) -> tuple:
+    """
+    Pairwise distance matrix for a tuple of (lat, lon) pairs, cached per set of stops.
+    """
+    n = len(coords)
+    rows = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1, n):
+            rows[i][j] = rows[j][i] = haversine_km(coords[i], coords[j])
+    return tuple(tuple(row) for row in rows)
+
+
+def table_matrix(addresses: list, distances: dict) -> tuple:
+    """
+    Pairwise distance matrix looked up from an offline road-distance table.
+
+    Args:
+        addresses (list): Addresses in pickup point order.
+        distances (dict): Kilometres keyed by (from_address, to_address); the
+            reverse pair is used when a direction is missing.
+    """
+    return tuple(
+        tuple(0.0 if a == b else _table_distance(distances, a, b) for b in addresses)
+        for a in addresses
+    )
+
+
+def _table_distance(distances: dict, a: str, b: str) -> float:
+    if (a, b) in distances:
+        return float(distances[(a, b)])
+    if (b, a) in distances:
+        return float(distances[(b, a)])
+    raise ValueError(f"No distance between '{a}' and '{b}' in the distance table")
+
+
+def _coords(item: dict):
+    if item is None or item.get("lat") is None or item.get("lon") is None:
+        return None
+    return (float(item["lat"]), float(item["lon"]))
+
+
+class RoutePlan:
+    """
+    Stop order and passenger-to-stop assignment for a multi-stop trip.
+
+    Distances come from the pickup points' "lat"/"lon" (haversine) or, for
+    pickup points that only have an address, from a supplied road-distance
+    table keyed by address pairs.
+
+    Passengers are assigned in join order to the nearest pickup point whose
+    time fits their window, up to the trip's seat count. Only stops with
+    assigned passengers are visited; their order is built by nearest
+    insertion and improved with 2-opt, minimising lateness against the
+    pickup point times first and driving distance second.
+    """
+
+    def __init__(self, pickup_points: list, seats: int, origin: dict = None, destination: dict = None,
+                 speed_kmh: float = AVERAGE_SPEED_KMH, slack_minutes: float = WINDOW_SLACK_MINUTES,
+                 distances: dict = None):
+        self.pickup_points = pickup_points
+        self.seats = seats
+        self.assignments = {}  # passenger id -> pickup point index
+        self.unassigned = []  # passenger ids that could not be placed, in join order
+        self._passengers = {}  # passenger id -> passenger dict, kept to retry the waiting list
+        self.order = []  # pickup point indices in visiting order
+
+        coords = [_coords(point) for point in pickup_points]
+        if all(c is not None for c in coords):
+            self._coords = tuple(coords)
+            self._matrix = distance_matrix(self._coords)
+            origin, destination = _coords(origin), _coords(destination)
+            self._from_origin = [haversine_km(origin, c) if origin else 0.0 for c in coords]
+            self._to_destination = [haversine_km(c, destination) if destination else 0.0 for c in coords]
+        elif distances is not None:
+            self._coords = None
+            addresses = [point.get("address") for point in pickup_points]
+            self._matrix = table_matrix(addresses, distances)
+            start = (origin or {}).get("address")
+            end = (destination or {}).get("address")
+            self._from_origin = [_table_distance(distances, start, a) if start else 0.0 for a in addresses]
+            self._to_destination = [_table_distance(distances, a, end) if end else 0.0 for a in addresses]
+        else:
+            raise ValueError("Pickup points need 'lat' and 'lon', or pass a distance table keyed by address")
+        self._minutes_per_km = 60.0 / speed_kmh
+
+        times = [parse_time(point.get("time")) for point in pickup_points]
+        known = [t for t in times if t is not None]
+        self._reference = min(known) if known else None
+        self._windows = [self._window(t, slack_minutes) for t in times]
+
+    def _window(self, time, slack_minutes: float):
+        if time is None:
+            return (-math.inf, math.inf)
+        minutes = (time - self._reference).total_seconds() / 60.0
+        return (minutes - slack_minutes, minutes + slack_minutes)
+
+    def _passenger_window(self, passenger: dict):
+        earliest, latest = parse_time(passenger.get("earliest")), parse_time(passenger.get("latest"))
+        if self._reference is None:
+            return (-math.inf, math.inf)
+        start = (earliest - self._reference).total_seconds() / 60.0 if earliest else -math.inf
+        end = (latest - self._reference).total_seconds() / 60.0 if latest else math.inf
+        return (start, end)
+
+    def cost(self, order: list) -> tuple:
+        """
+        Return (lateness in minutes, distance in km) for visiting stops in `order`.
+        """
+        if not order:
+            return (0.0, 0.0)
+        matrix, windows = self._matrix, self._windows
+        distance = self._from_origin[order[0]] + self._to_destination[order[-1]]
+        start = windows[order[0]][0]
+        clock = start if start != -math.inf else 0.0
+        lateness = 0.0
+        for prev, stop in zip(order, order[1:]):
+            leg = matrix[prev][stop]
+            distance += leg
+            clock = max(clock + leg * self._minutes_per_km, windows[stop][0])
+            lateness += max(0.0, clock - windows[stop][1])
+        return (round(lateness, 6), distance)
+
+    def _best_insertion(self, order: list, stop: int) -> list:
+        candidates = (order[:i] + [stop] + order[i:] for i in range(len(order) + 1))
+        return min(candidates, key=self.cost)
+
+    def _two_opt(self, order: list) -> list:
+        best, best_cost = order, self.cost(order)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(best) - 1):
+                for j in range(i + 1, len(best)):
+                    candidate = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                    candidate_cost = self.cost(candidate)
+                    if candidate_cost < best_cost:
+                        best, best_cost, improved = candidate, candidate_cost, True
+        return best
+
+    def _choose_stop(self, passenger: dict):
+        start, end = self._passenger_window(passenger)
+        candidates = [i for i, (lo, hi) in enumerate(self._windows) if lo <= end and hi >= start]
+        if not candidates:
+            return None
+        home = _coords(passenger)
+        if home is not None and self._coords is not None:
+            return min(candidates, key=lambda i: haversine_km(home, self._coords[i]))
+        for i in candidates:
+            if self.pickup_points[i].get("id") is not None and self.pickup_points[i].get("id") == passenger.get("pickup_id"):
+                return i
+        return candidates[0]
+
+    def _forget(self, passenger_id):
+        """
+        Remove a passenger from the plan and return the stop they held, if any.
+        """
+        self._passengers.pop(passenger_id, None)
+        if passenger_id in self.unassigned:
+            self.unassigned.remove(passenger_id)
+        return self.assignments.pop(passenger_id, None)
+
+    def _drop_if_unused(self, stop):
+        if stop is not None and stop not in self.assignments.values():
+            self.order = self._two_opt([s for s in self.order if s != stop])
+
+    def _assign(self, passenger: dict):
+        self._passengers[passenger["id"]] = passenger
+        if len(self.assignments) >= self.seats:
+            self.unassigned.append(passenger["id"])
+            return None
+        stop = self._choose_stop(passenger)
+        if stop is None:
+            self.unassigned.append(passenger["id"])
+            return None
+        self.assignments[passenger["id"]] = stop
+        return stop
+
+    def solve(self, passengers: list):
+        """
+        Assign all passengers and compute the stop order from scratch.
+        """
+        self.assignments, self.unassigned, self._passengers = {}, [], {}
+        for passenger in passengers:
+            self._forget(passenger["id"])  # A repeated id replaces the earlier entry
+            self._assign(passenger)
+        remaining = set(self.assignments.values())
+        order = []
+        while remaining:
+            if order:
+                stop = min(remaining, key=lambda s: min(self._matrix[s][o] for o in order))
+            else:
+                stop = min(remaining, key=lambda s: (self._windows[s][0], self._from_origin[s]))
+            order = self._best_insertion(order, stop)
+            remaining.discard(stop)
+        self.order = self._two_opt(order)
+        return self
+
+    def add_passenger(self, passenger: dict):
+        """
+        Incrementally place one newly joined passenger. The existing order is
+        kept when their stop is already visited; otherwise the stop is inserted
+        at its cheapest position and the order re-polished with 2-opt. A
+        passenger already in the plan is replaced, keeping their seat.
+
+        Returns:
+            int | None: The assigned pickup point index, or None if no seat or stop fits.
+        """
+        previous = self._forget(passenger["id"])
+        stop = self._assign(passenger)
+        if previous != stop:
+            self._drop_if_unused(previous)
+        if stop is not None and stop not in self.order:
+            self.order = self._two_opt(self._best_insertion(self.order, stop))
+        return stop
+
+    def remove_passenger(self, passenger_id):
+        """
+        Drop a passenger and offer the freed seat to the waiting list in join order.
+        """
+        stop = self._forget(passenger_id)
+        if stop is None:
+            return
+        self._drop_if_unused(stop)
+        waiting, self.unassigned = self.unassigned, []
+        for waiting_id in waiting:
+            self.add_passenger(self._passengers[waiting_id])
+
+    def as_dict(self) -> dict:
+        lateness, distance = self.cost(self.order)
+        return {
+            "stops": [self.pickup_points[i] for i in self.order],
+            "assignments": {pid: self.pickup_points[i] for pid, i in self.assignments.items()},
+            "unassigned": list(self.unassigned),
+            "distance_km": round(distance, 3),
+            "lateness_minutes": lateness,
+        }
+
+
+def plan_route(pickup_points: list, passengers: list, seats: int, origin: dict = None, destination: dict = None,
+               distances: dict = None) -> RoutePlan:
+    """
+    Plan the stop order and passenger assignment for a trip.
+
+    Args:
+        pickup_points (list): Pickup points with "address", optional ISO "time" and
+            optional "lat"/"lon".
+        passengers (list): Passengers in join order with "id" and optional "lat", "lon",
+            "earliest", "latest" and "pickup_id".
+        seats (int): Number of passenger seats.
+        origin (dict): Optional driver start location with "lat"/"lon" or "address".
+        destination (dict): Optional trip destination with "lat"/"lon" or "address".
+        distances (dict): Road distances in km keyed by (from_address, to_address),
+            required when the pickup points have no coordinates.
+
+    Returns:
+        RoutePlan: The solved plan; call add_passenger() to update it incrementally.
+    """
+    return RoutePlan(pickup_points, seats, origin, destination, distances=distances).solve(passengers)
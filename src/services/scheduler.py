@@ -0,0 +1,354 @@
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from telegram.error import RetryAfter
+from xata.client import XataClient  # Use Xata client for database interactions
+from sentry_sdk import capture_exception
+from src.utils.time_utils import parse_time
+from src.utils.xata_pages import query_pages
+from src.config.config import SCHEDULER_STATE_PATH, REMINDER_LEAD_MINUTES, TRIP_CLOSE_GRACE_MINUTES
+
+logger = logging.getLogger(__name__)
+
+xata = XataClient()
+
+REMINDER = "reminder"
+CLOSE = "close"
+SLOT_SECONDS = 60  # Timers due within the same minute fire as one batch
+MAX_ATTEMPTS = 5  # Failed jobs are retried in the next slot up to this many times
+MAX_CHECKPOINT_BACKOFF_SECONDS = 300
+
+
+def departure_time(trip: dict):
+    """
+    Return the departure time of a trip: the earliest pickup point time.
+    """
+    times = [parse_time(point.get("time")) for point in trip.get("pickup_points") or []]
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+def trip_jobs(trip: dict, now: datetime = None):
+    """
+    Build the reminder and auto-close jobs for a trip as (kind, trip_id, due, payload) tuples.
+
+    Reminders whose due time has already passed are skipped; a trip that has
+    departed but is still active only gets its (overdue) close job.
+    """
+    now = now or datetime.utcnow()
+    departure = departure_time(trip)
+    if departure is None or trip.get("status", "active") != "active":
+        return []
+    # Recipients are read when the job fires, so passengers who join later are included
+    payload = {"departure": departure.isoformat()}
+    jobs = []
+    reminder_due = departure - timedelta(minutes=REMINDER_LEAD_MINUTES)
+    if reminder_due > now:
+        jobs.append((REMINDER, trip["id"], reminder_due, payload))
+    jobs.append((CLOSE, trip["id"], departure + timedelta(minutes=TRIP_CLOSE_GRACE_MINUTES), payload))
+    return jobs
+
+
+class TripScheduler:
+    """
+    Minute-granular timer queue for trip reminders and auto-closing.
+
+    Timers are grouped into one-minute slots kept in a heap, so due work is
+    found without scanning every pending timer, and everything due in the
+    same slot is handed to the handler as a single batch per job kind.
+    Pending timers, and the reminders already sent for upcoming departures,
+    are checkpointed to a local JSON file and reloaded on start.
+    """
+
+    def __init__(self, handler, state_path: str = SCHEDULER_STATE_PATH, tick_seconds: float = 1.0):
+        self._handler = handler  # async callable(kind, jobs) -> list of jobs that failed, or None
+        self._state_path = state_path
+        self._tick_seconds = tick_seconds
+        self._heap = []  # slot numbers, lazily pruned
+        self._slots = {}  # slot -> {(kind, trip_id): job}
+        self._index = {}  # (kind, trip_id) -> slot
+        self._reminded = {}  # trip_id -> departure of the reminder already sent
+        self._dirty = False
+        self._checkpoint_backoff = 0.0
+        self._next_checkpoint_at = 0.0  # time.monotonic() before which failed writes are not retried
+        self._task = None
+
+    def __len__(self):
+        return len(self._index)
+
+    def schedule(self, kind: str, trip_id: str, due: datetime, payload: dict = None, attempts: int = 0):
+        """
+        Add or replace the timer for (kind, trip_id). A reminder already sent
+        for the same departure is not scheduled again.
+        """
+        key = (kind, trip_id)
+        if kind == REMINDER and self._reminded.get(trip_id) == (payload or {}).get("departure"):
+            return
+        self.cancel(kind, trip_id)
+        slot = int(due.timestamp()) // SLOT_SECONDS
+        if slot not in self._slots:
+            self._slots[slot] = {}
+            heapq.heappush(self._heap, slot)
+        self._slots[slot][key] = {
+            "kind": kind,
+            "trip_id": trip_id,
+            "due": due.isoformat(),
+            "payload": dict(payload or {}),
+            "attempts": attempts,
+        }
+        self._index[key] = slot
+        self._dirty = True
+
+    def schedule_trip(self, trip: dict, now: datetime = None):
+        for kind, trip_id, due, payload in trip_jobs(trip, now):
+            self.schedule(kind, trip_id, due, payload)
+
+    def cancel(self, kind: str, trip_id: str):
+        slot = self._index.pop((kind, trip_id), None)
+        if slot is None:
+            return
+        jobs = self._slots.get(slot)
+        jobs.pop((kind, trip_id), None)
+        if not jobs:
+            # The heap entry is left in place and skipped when popped
+            del self._slots[slot]
+        self._dirty = True
+
+    def cancel_trip(self, trip_id: str):
+        self.cancel(REMINDER, trip_id)
+        self.cancel(CLOSE, trip_id)
+
+    def pop_due(self, now: datetime):
+        """
+        Remove and return every job due at or before `now`, grouped by kind.
+        """
+        current = int(now.timestamp()) // SLOT_SECONDS
+        batches = {}
+        while self._heap and self._heap[0] <= current:
+            slot = heapq.heappop(self._heap)
+            for key, job in self._slots.pop(slot, {}).items():
+                self._index.pop(key, None)
+                batches.setdefault(job["kind"], []).append(job)
+        if batches:
+            self._dirty = True
+        return batches
+
+    async def fire_due(self, now: datetime = None):
+        now = now or datetime.utcnow()
+        batches = self.pop_due(now)
+        for kind, jobs in batches.items():
+            try:
+                failed = await self._handler(kind, jobs) or []
+            except Exception as e:
+                logger.error(f"Failed to run {len(jobs)} {kind} job(s): {str(e)}")
+                capture_exception(e)
+                failed = jobs
+            if failed:
+                logger.warning(f"Retrying {len(failed)} of {len(jobs)} {kind} job(s)")
+                self._retry(failed, now)
+            if kind == REMINDER:
+                failed_ids = {job["trip_id"] for job in failed}
+                for job in jobs:
+                    if job["trip_id"] not in failed_ids:
+                        self._reminded[job["trip_id"]] = job["payload"].get("departure")
+        if batches:
+            self._prune_reminded(now)
+        if self._dirty and time.monotonic() >= self._next_checkpoint_at:
+            self.checkpoint()
+        return batches
+
+    def _retry(self, jobs: list, now: datetime):
+        retry_at = now + timedelta(seconds=SLOT_SECONDS)
+        for job in jobs:
+            if job.get("attempts", 0) + 1 >= MAX_ATTEMPTS:
+                logger.error(f"Dropping {job['kind']} job for trip {job['trip_id']} after {MAX_ATTEMPTS} attempts")
+                continue
+            self.schedule(job["kind"], job["trip_id"], retry_at, job["payload"], job.get("attempts", 0) + 1)
+
+    def _prune_reminded(self, now: datetime):
+        departed = [trip_id for trip_id, departure in self._reminded.items() if (parse_time(departure) or now) <= now]
+        for trip_id in departed:
+            del self._reminded[trip_id]
+
+    def checkpoint(self):
+        """
+        Atomically write pending timers and sent reminders to the state file.
+        """
+        jobs = [job for slot_jobs in self._slots.values() for job in slot_jobs.values()]
+        tmp_path = f"{self._state_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"version": 1, "jobs": jobs, "reminded": self._reminded}, f)
+            os.replace(tmp_path, self._state_path)
+            self._dirty = False
+            self._checkpoint_backoff = 0.0
+        except OSError as e:
+            # Back off so an unwritable path does not log and report on every tick
+            if not self._checkpoint_backoff:
+                capture_exception(e)
+            self._checkpoint_backoff = min(max(self._checkpoint_backoff * 2, SLOT_SECONDS), MAX_CHECKPOINT_BACKOFF_SECONDS)
+            self._next_checkpoint_at = time.monotonic() + self._checkpoint_backoff
+            logger.error(f"Failed to checkpoint scheduler state to {self._state_path}, retrying in {self._checkpoint_backoff:.0f}s: {str(e)}")
+
+    def load(self, now: datetime = None):
+        """
+        Restore timers from the state file. Reminders whose trip has already
+        departed are dropped; overdue close jobs fire on the next tick.
+        """
+        now = now or datetime.utcnow()
+        try:
+            with open(self._state_path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load scheduler state: {str(e)}")
+            capture_exception(e)
+            return 0
+        self._reminded.update(state.get("reminded", {}))
+        self._prune_reminded(now)
+        loaded = 0
+        for job in state.get("jobs", []):
+            due = parse_time(job.get("due"))
+            departure = parse_time(job.get("payload", {}).get("departure"))
+            if due is None or (job["kind"] == REMINDER and departure is not None and departure <= now):
+                continue
+            self.schedule(job["kind"], job["trip_id"], due, job.get("payload"), job.get("attempts", 0))
+            loaded += 1
+        return loaded
+
+    async def rebuild(self, now: datetime = None):
+        """
+        Load the checkpoint and merge in timers for active trips, read page by
+        page. Departed trips still marked active only get their close job.
+        """
+        now = now or datetime.utcnow()
+        loaded = self.load(now)
+        try:
+            trips = await asyncio.to_thread(active_trips)
+            for trip in trips:
+                self.schedule_trip(trip, now)
+        except Exception as e:
+            logger.error(f"Failed to rebuild scheduler from trips: {str(e)}")
+            capture_exception(e)
+        self.checkpoint()
+        logger.info(f"Scheduler rebuilt: {loaded} timer(s) from checkpoint, {len(self)} pending")
+
+    async def _run(self):
+        while True:
+            await self.fire_due()
+            await asyncio.sleep(self._tick_seconds)
+
+    async def start(self):
+        await self.rebuild()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.checkpoint()
+
+
+def active_trips():
+    """
+    Read all active trips using cursor pagination.
+    """
+    return [trip for trip, _ in query_pages(xata, "trips", filter={"status": "active"})]
+
+
+def trips_by_id(trip_ids: list) -> dict:
+    """
+    Read the current state of several trips with one filtered, paginated query.
+    """
+    return {trip["id"]: trip for trip, _ in query_pages(xata, "trips", filter={"id": {"$any": list(trip_ids)}})}
+
+
+class TripJobHandler:
+    """
+    Runs a batch of due jobs as one sequential job instead of one task per timer,
+    and returns the jobs that failed so the scheduler can retry them.
+    """
+
+    def __init__(self, bot):
+        self._bot = bot
+
+    async def __call__(self, kind: str, jobs: list):
+        if kind == REMINDER:
+            return await self.send_reminders(jobs)
+        if kind == CLOSE:
+            return await self.close_trips(jobs)
+        return []
+
+    async def send_reminders(self, jobs: list):
+        trips = await asyncio.to_thread(trips_by_id, [job["trip_id"] for job in jobs])
+        failed = []
+        for n, job in enumerate(jobs):
+            trip = trips.get(job["trip_id"])
+            if not trip or trip.get("status") != "active":
+                continue
+            payload = job["payload"]
+            sent = payload.setdefault("sent", [])  # Kept across retries so nobody is reminded twice
+            text = f"Reminder: trip {job['trip_id']} departs at {payload.get('departure')}."
+            recipients = [trip.get("driver_id")] + list(trip.get("passengers") or [])
+            try:
+                for chat_id in filter(None, dict.fromkeys(recipients)):
+                    if chat_id in sent:
+                        continue
+                    await self._bot.send_message(chat_id=chat_id, text=text)
+                    sent.append(chat_id)
+            except RetryAfter as e:
+                # Flood control: stop the batch and retry the rest in a later slot
+                logger.warning(f"Telegram asked to retry after {e.retry_after}s, deferring {len(jobs) - n} reminder(s)")
+                failed.extend(jobs[n:])
+                break
+            except Exception as e:
+                capture_exception(e)
+                failed.append(job)
+        return failed
+
+    async def close_trips(self, jobs: list):
+        failed = []
+        for job in jobs:
+            try:
+                resp = await asyncio.to_thread(xata.records().update, "trips", job["trip_id"], {"status": "closed"})
+                if not resp.is_success():
+                    raise RuntimeError(f"Failed to close trip {job['trip_id']}: {resp}")
+            except Exception as e:
+                capture_exception(e)
+                failed.append(job)
+        return failed
+
+
+scheduler = None  # Global TripScheduler instance, set by start_scheduler()
+
+
+async def start_scheduler(bot):
+    global scheduler
+    if scheduler is None:
+        scheduler = TripScheduler(TripJobHandler(bot))
+        await scheduler.start()
+    return scheduler
+
+
+async def stop_scheduler():
+    global scheduler
+    if scheduler is not None:
+        await scheduler.stop()
+        scheduler = None
+
+
+def schedule_trip(trip: dict):
+    """
+    Register timers for a trip if the scheduler is running.
+    """
+    if scheduler is not None:
+        scheduler.schedule_trip(trip)
@@ -1,5 +1,6 @@
 from xata.client import XataClient  # Use Xata client for database interactions
 from src.utils.template_renderer import render_template  # Ensure correct relative import
+from src.services.scheduler import schedule_trip
 from sentry_sdk import capture_exception
 from datetime import datetime
 from httpx import Timeout  # Import Timeout for setting request timeouts
@@ -19,6 +20,7 @@ async def create_trip(driver_id: str, seats: int, pickup_points: list):
             "created_at": datetime.utcnow().isoformat(),
         }
         trip = await xata.table("trips").create(trip_data)
+        schedule_trip({**trip_data, "id": trip["id"]})  # Departure reminder and auto-close
         return trip["id"]
     except Exception as e:
         capture_exception(e)
@@ -0,0 +1,113 @@
+import io
+import json
+import pytest
+from src.tools.bulk import SQLiteStore, export_table, import_table, Progress, main
+
+records = [{"id": f"rec_{i:05d}", "name": f"User {i}", "role": "passenger"} for i in range(1234)]
+
+
+def quiet(label: str):
+    return Progress(label, stream=io.StringIO())
+
+
+def ndjson(items):
+    return [json.dumps(item) + "\n" for item in items]
+
+
+def test_sqlite_round_trip(tmp_path):
+    source = SQLiteStore("users", str(tmp_path / "a.db"))
+    assert import_table(source, ndjson(records), batch_size=100, concurrency=3, progress=quiet("import")) == 1234
+
+    out = io.StringIO()
+    assert export_table(source, out, page_size=50, progress=quiet("export")) == 1234
+    exported = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert exported == records
+
+
+def test_import_resumes_from_checkpoint(tmp_path):
+    checkpoint = str(tmp_path / "import.json")
+
+    class FlakyStore(SQLiteStore):
+        fail_after = 3
+
+        def write(self, batch):
+            if self.fail_after == 0:
+                raise RuntimeError("connection lost")
+            self.fail_after -= 1
+            super().write(batch)
+
+    store = FlakyStore("users", str(tmp_path / "b.db"))
+    with pytest.raises(RuntimeError):
+        import_table(store, ndjson(records), checkpoint, batch_size=100, concurrency=1, progress=quiet("import"))
+    assert json.load(open(checkpoint))["line"] == 300
+
+    store.fail_after = -1
+    import_table(store, ndjson(records), checkpoint, batch_size=100, concurrency=1, progress=quiet("import"))
+    assert [r for r, _ in store.read()] == records
+
+
+def test_export_resumes_from_checkpoint(tmp_path):
+    store = SQLiteStore("users", str(tmp_path / "c.db"))
+    store.write(records)
+    checkpoint = str(tmp_path / "export.json")
+    with open(checkpoint, "w") as f:
+        json.dump({"cursor": "rec_00999", "count": 1000}, f)
+
+    out = io.StringIO()
+    assert export_table(store, out, checkpoint, page_size=100, progress=quiet("export")) == 1234
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == records[1000:]
+
+
+def test_cli_sqlite_to_file(tmp_path, capsys):
+    db = tmp_path / "d.db"
+    SQLiteStore("trips", str(db)).write(records[:10])
+    output = tmp_path / "trips.ndjson"
+    main(["export", "--table", "trips", "--source", f"sqlite:{db}", "--output", str(output)])
+    assert len(output.read_text().splitlines()) == 10
+    assert "10 records" in capsys.readouterr().err
+
+
+def test_resumed_export_file_has_no_duplicates(tmp_path):
+    class InterruptedStore(SQLiteStore):
+        def read(self, cursor=None, page_size=1000):
+            for n, item in enumerate(super().read(cursor, page_size)):
+                if n == 250:
+                    raise RuntimeError("connection lost")
+                yield item
+
+    db = str(tmp_path / "e.db")
+    SQLiteStore("users", db).write(records)
+    checkpoint = str(tmp_path / "export.json")
+    output = tmp_path / "users.ndjson"
+
+    with open(output, "w") as out, pytest.raises(RuntimeError):
+        export_table(InterruptedStore("users", db), out, checkpoint, page_size=100, progress=quiet("export"))
+    assert json.load(open(checkpoint))["count"] == 200
+    assert len(output.read_text().splitlines()) == 250
+
+    main(["export", "--table", "users", "--source", f"sqlite:{db}", "--output", str(output), "--checkpoint", checkpoint])
+    assert [json.loads(line) for line in output.read_text().splitlines()] == records
+    assert json.load(open(checkpoint))["count"] == len(records)
+
+
+def test_export_checkpoint_edge_cases(tmp_path):
+    db = str(tmp_path / "f.db")
+    SQLiteStore("users", db).write(records[:300])
+    checkpoint = str(tmp_path / "export.json")
+    output = tmp_path / "users.ndjson"
+    args = ["export", "--table", "users", "--source", f"sqlite:{db}", "--output", str(output),
+            "--checkpoint", checkpoint, "--page-size", "100"]
+
+    # A finished checkpoint starts a fresh, complete export
+    main(args)
+    main(args)
+    assert len(output.read_text().splitlines()) == 300
+    assert json.load(open(checkpoint))["count"] == 300
+
+    # A partial checkpoint whose output file is gone is refused
+    with open(checkpoint, "w") as f:
+        json.dump({"cursor": "rec_00099", "count": 100, "offset": 0}, f)
+    output.unlink()
+    with pytest.raises(SystemExit):
+        main(args)
+    assert not output.exists()
@@ -0,0 +1,106 @@
+import pytest
+from src.services.route import RoutePlan, plan_route, haversine_km
+
+# Five stops along a line of longitude, roughly 1.1 km apart
+pickup_points = [
+    {"id": str(i), "address": f"Stop {i}", "lat": 52.0 + i * 0.01, "lon": 4.0, "time": None}
+    for i in range(5)
+]
+
+
+def passenger_at(pid: str, stop: int):
+    return {"id": pid, "lat": pickup_points[stop]["lat"] + 0.0001, "lon": 4.0}
+
+
+def test_haversine_km():
+    assert haversine_km((52.0, 4.0), (52.0, 4.0)) == 0.0
+    assert haversine_km((52.0, 4.0), (53.0, 4.0)) == pytest.approx(111.19, rel=1e-3)
+
+
+def test_order_follows_geometry():
+    passengers = [passenger_at(str(i), stop) for i, stop in enumerate([3, 0, 4, 1, 2])]
+    plan = plan_route(pickup_points, passengers, seats=5)
+    assert plan.order in ([0, 1, 2, 3, 4], [4, 3, 2, 1, 0])
+    assert plan.assignments == {"0": 3, "1": 0, "2": 4, "3": 1, "4": 2}
+
+
+def test_seats_are_respected():
+    passengers = [passenger_at(str(i), i) for i in range(5)]
+    plan = plan_route(pickup_points, passengers, seats=3)
+    assert len(plan.assignments) == 3
+    assert plan.unassigned == ["3", "4"]
+    assert sorted(plan.order) == [0, 1, 2]
+
+
+def test_time_windows_drive_order():
+    points = [
+        {"id": "a", "lat": 52.00, "lon": 4.0, "time": "2025-06-01T19:00:00"},
+        {"id": "b", "lat": 52.01, "lon": 4.0, "time": "2025-06-01T18:00:00"},
+        {"id": "c", "lat": 52.02, "lon": 4.0, "time": "2025-06-01T18:30:00"},
+    ]
+    passengers = [{"id": p["id"], "pickup_id": p["id"]} for p in points]
+    plan = plan_route(points, passengers, seats=3)
+    assert [points[i]["id"] for i in plan.order] == ["b", "c", "a"]
+    assert plan.as_dict()["lateness_minutes"] == 0.0
+
+
+def test_passenger_window_excludes_stop():
+    points = [
+        {"id": "early", "lat": 52.00, "lon": 4.0, "time": "2025-06-01T18:00:00"},
+        {"id": "late", "lat": 52.05, "lon": 4.0, "time": "2025-06-01T19:00:00"},
+    ]
+    passenger = {"id": "p", "lat": 52.0, "lon": 4.0, "earliest": "2025-06-01T18:45:00"}
+    plan = plan_route(points, [passenger], seats=2)
+    assert plan.assignments == {"p": 1}
+
+
+def test_add_passenger_incrementally():
+    plan = plan_route(pickup_points, [passenger_at("0", 0), passenger_at("1", 4)], seats=3)
+    assert plan.add_passenger(passenger_at("2", 2)) == 2
+    assert plan.order in ([0, 2, 4], [4, 2, 0])
+    assert plan.add_passenger(passenger_at("3", 1)) is None
+    assert plan.unassigned == ["3"]
+
+
+def test_missing_coordinates():
+    with pytest.raises(ValueError):
+        RoutePlan([{"address": "Somewhere"}], seats=1)
+
+
+def test_address_only_points_use_distance_table():
+    points = [{"id": address, "address": address, "time": None} for address in ("Gym", "Station", "Market")]
+    distances = {("Gym", "Station"): 5.0, ("Station", "Market"): 1.0, ("Gym", "Market"): 4.5}
+    passengers = [{"id": str(i), "pickup_id": point["id"]} for i, point in enumerate(points)]
+    plan = plan_route(points, passengers, seats=3, distances=distances)
+    assert plan.order in ([0, 2, 1], [1, 2, 0])
+    assert plan.as_dict()["distance_km"] == 5.5
+
+    with pytest.raises(ValueError):
+        RoutePlan(points, seats=3, distances={("Gym", "Station"): 5.0})
+
+
+def test_rejoining_passenger_is_replaced():
+    plan = plan_route(pickup_points, [passenger_at("a", 0)], seats=1)
+    assert plan.add_passenger(passenger_at("a", 3)) == 3
+    assert plan.assignments == {"a": 3}
+    assert plan.unassigned == []
+    assert plan.order == [3]
+
+    plan = plan_route(pickup_points, [passenger_at("a", 0), passenger_at("a", 0)], seats=1)
+    assert plan.assignments == {"a": 0}
+    assert plan.unassigned == []
+
+
+def test_remove_passenger_frees_seat_for_waiting_list():
+    passengers = [passenger_at(str(i), i) for i in range(4)]
+    plan = plan_route(pickup_points, passengers, seats=2)
+    assert plan.unassigned == ["2", "3"]
+
+    plan.remove_passenger("3")
+    assert plan.unassigned == ["2"]
+    assert "3" not in plan.as_dict()["unassigned"]
+
+    plan.remove_passenger("0")
+    assert plan.assignments == {"1": 1, "2": 2}
+    assert plan.unassigned == []
+    assert sorted(plan.order) == [1, 2]
@@ -0,0 +1,206 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+from telegram.error import RetryAfter
+from src.services import scheduler as scheduler_module
+from src.services.scheduler import TripScheduler, TripJobHandler, REMINDER, CLOSE, MAX_ATTEMPTS, departure_time
+
+now = datetime(2025, 6, 1, 18, 0, 0)
+
+
+def make_trip(trip_id: str, departs: datetime):
+    return {
+        "id": trip_id,
+        "driver_id": "1",
+        "status": "active",
+        "passengers": ["2", "3"],
+        "pickup_points": [
+            {"address": "Gym", "time": (departs + timedelta(minutes=10)).isoformat()},
+            {"address": "Station", "time": departs.isoformat()},
+        ],
+    }
+
+
+def make_scheduler(tmp_path, fired):
+    async def handler(kind, jobs):
+        fired.append((kind, [job["trip_id"] for job in jobs]))
+    return TripScheduler(handler, state_path=str(tmp_path / "state.json"))
+
+
+def test_departure_time_is_earliest_pickup():
+    trip = make_trip("t1", now)
+    assert departure_time(trip) == now
+    assert departure_time({"pickup_points": [{"time": "not a time"}]}) is None
+
+
+def test_same_minute_timers_fire_as_one_batch(tmp_path):
+    fired = []
+    scheduler = make_scheduler(tmp_path, fired)
+    for i in range(1000):
+        scheduler.schedule_trip(make_trip(f"t{i}", now + timedelta(minutes=30, seconds=i % 60)), now - timedelta(minutes=1))
+    assert len(scheduler) == 2000
+
+    asyncio.run(scheduler.fire_due(now - timedelta(minutes=1)))
+    assert fired == []
+
+    asyncio.run(scheduler.fire_due(now + timedelta(seconds=59)))
+    assert len(fired) == 1
+    assert fired[0][0] == REMINDER
+    assert len(fired[0][1]) == 1000
+    assert len(scheduler) == 1000
+
+
+def test_rescheduling_and_cancel(tmp_path):
+    fired = []
+    scheduler = make_scheduler(tmp_path, fired)
+    scheduler.schedule_trip(make_trip("t1", now + timedelta(hours=1)), now)
+    scheduler.schedule_trip(make_trip("t1", now + timedelta(hours=2)), now)
+    assert len(scheduler) == 2
+    scheduler.cancel_trip("t1")
+    assert len(scheduler) == 0
+    asyncio.run(scheduler.fire_due(now + timedelta(days=1)))
+    assert fired == []
+
+
+def test_checkpoint_survives_restart(tmp_path):
+    fired = []
+    scheduler = make_scheduler(tmp_path, fired)
+    scheduler.schedule_trip(make_trip("t1", now + timedelta(hours=2)), now)
+    scheduler.schedule_trip(make_trip("t2", now + timedelta(minutes=35)), now)
+    scheduler.checkpoint()
+
+    restored = make_scheduler(tmp_path, fired)
+    # t2 already departed: its reminder is dropped, its close job is kept
+    assert restored.load(now + timedelta(minutes=40)) == 3
+    asyncio.run(restored.fire_due(now + timedelta(minutes=60)))
+    assert fired == [(CLOSE, ["t2"])]
+
+
+def test_past_reminders_are_not_scheduled(tmp_path):
+    scheduler = make_scheduler(tmp_path, [])
+    scheduler.schedule_trip(make_trip("old", now - timedelta(days=3)), now)
+    scheduler.schedule_trip(make_trip("soon", now + timedelta(minutes=10)), now)
+    assert sorted(scheduler._index) == [(CLOSE, "old"), (CLOSE, "soon")]
+
+
+def test_rebuild_from_active_trips(tmp_path, monkeypatch):
+    trips = [
+        make_trip("old", now - timedelta(days=3)),
+        make_trip("soon", now + timedelta(minutes=40)),
+        make_trip("later", now + timedelta(hours=3)),
+    ]
+    queries = []
+
+    def fake_query_pages(client, table, cursor=None, page_size=200, filter=None):
+        assert table == "trips"
+        queries.append(filter)
+        return [(trip, "cursor") for trip in trips if trip["status"] == filter["status"]]
+
+    monkeypatch.setattr(scheduler_module, "query_pages", fake_query_pages)
+    fired = []
+    scheduler = make_scheduler(tmp_path, fired)
+    asyncio.run(scheduler.rebuild(now))
+    assert queries == [{"status": "active"}]
+
+    # The departed trip is closed but never reminded
+    asyncio.run(scheduler.fire_due(now + timedelta(minutes=10)))
+    assert sorted(fired) == [(CLOSE, ["old"]), (REMINDER, ["soon"])]
+    trips[0]["status"] = "closed"
+
+    # After a restart the reminder already sent for "soon" is not repeated
+    fired.clear()
+    restarted = make_scheduler(tmp_path, fired)
+    asyncio.run(restarted.rebuild(now + timedelta(minutes=15)))
+    assert (REMINDER, "soon") not in restarted._index
+    assert (REMINDER, "later") in restarted._index
+    asyncio.run(restarted.fire_due(now + timedelta(minutes=20)))
+    assert fired == []
+
+
+def test_failed_batch_is_retried(tmp_path):
+    attempts = []
+
+    async def handler(kind, jobs):
+        attempts.append(len(jobs))
+        raise RuntimeError("telegram down")
+
+    scheduler = TripScheduler(handler, state_path=str(tmp_path / "state.json"))
+    scheduler.schedule_trip(make_trip("t1", now + timedelta(hours=1)), now)
+    due = now + timedelta(minutes=30)
+    asyncio.run(scheduler.fire_due(due))
+    assert (REMINDER, "t1") in scheduler._index
+
+    for minute in range(1, MAX_ATTEMPTS + 1):
+        asyncio.run(scheduler.fire_due(due + timedelta(minutes=minute)))
+    assert attempts == [1] * MAX_ATTEMPTS
+    assert (REMINDER, "t1") not in scheduler._index
+
+
+def test_reminders_read_current_passengers_and_retry_failures(tmp_path, monkeypatch):
+    trip = make_trip("t1", now + timedelta(hours=1))
+    other = make_trip("t2", now + timedelta(hours=1))
+    lookups = []
+
+    def fake_trips_by_id(trip_ids):
+        lookups.append(sorted(trip_ids))
+        return {"t1": trip, "t2": other}
+
+    monkeypatch.setattr(scheduler_module, "trips_by_id", fake_trips_by_id)
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=[None, RuntimeError("blocked")] + [None] * 6)
+    scheduler = TripScheduler(TripJobHandler(bot), state_path=str(tmp_path / "state.json"))
+    scheduler.schedule_trip(trip, now)
+    scheduler.schedule_trip(other, now)
+    trip["passengers"].append("4")  # Joined after the trip was scheduled
+
+    due = now + timedelta(minutes=30)
+    asyncio.run(scheduler.fire_due(due))
+    assert lookups == [["t1", "t2"]]
+    # Passenger "2" of t1 failed: t1 is retried, t2 is done
+    assert (REMINDER, "t1") in scheduler._index
+    assert (REMINDER, "t2") not in scheduler._index
+
+    asyncio.run(scheduler.fire_due(due + timedelta(minutes=1)))
+    assert (REMINDER, "t1") not in scheduler._index
+    calls = [c.kwargs["chat_id"] for c in bot.send_message.call_args_list]
+    # t1: 1 sent, 2 failed | t2: 1, 2, 3 | t1 retried: 2, 3, 4 (1 is not reminded twice)
+    assert calls == ["1", "2", "1", "2", "3", "2", "3", "4"]
+
+
+def test_flood_control_defers_rest_of_batch(tmp_path, monkeypatch):
+    trips = {f"t{i}": make_trip(f"t{i}", now + timedelta(hours=1)) for i in range(3)}
+    monkeypatch.setattr(scheduler_module, "trips_by_id", lambda trip_ids: trips)
+    bot = MagicMock()
+    bot.send_message = AsyncMock(side_effect=[None, None, None, RetryAfter(5)])
+    handler = TripJobHandler(bot)
+    jobs = [{"trip_id": trip_id, "payload": {}} for trip_id in trips]
+    failed = asyncio.run(handler(REMINDER, jobs))
+    assert [job["trip_id"] for job in failed] == ["t1", "t2"]
+    assert bot.send_message.call_count == 4
+
+
+def test_failed_close_is_retried(tmp_path, monkeypatch):
+    resp = MagicMock()
+    resp.is_success.side_effect = [False, True]
+    client = MagicMock()
+    client.records.return_value.update.return_value = resp
+    monkeypatch.setattr(scheduler_module, "xata", client)
+
+    scheduler = TripScheduler(TripJobHandler(MagicMock()), state_path=str(tmp_path / "state.json"))
+    scheduler.schedule_trip(make_trip("t1", now - timedelta(hours=1)), now)
+    asyncio.run(scheduler.fire_due(now))
+    assert (CLOSE, "t1") in scheduler._index
+    asyncio.run(scheduler.fire_due(now + timedelta(minutes=1)))
+    assert (CLOSE, "t1") not in scheduler._index
+    client.records.return_value.update.assert_called_with("trips", "t1", {"status": "closed"})
+
+
+def test_unwritable_checkpoint_backs_off(tmp_path, monkeypatch):
+    reported = []
+    monkeypatch.setattr(scheduler_module, "capture_exception", reported.append)
+    scheduler = make_scheduler(tmp_path / "missing", [])
+    scheduler.schedule_trip(make_trip("t1", now + timedelta(hours=1)), now)
+    for _ in range(10):
+        asyncio.run(scheduler.fire_due(now))
+    assert len(reported) == 1
+    assert scheduler._checkpoint_backoff == scheduler_module.SLOT_SECONDS
@@ -0,0 +1,165 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from telegram.ext import ApplicationHandlerStop
+from src.handlers import throttle as throttle_module
+from src.handlers.throttle import TokenBuckets, Coalescer, consume_all, parse_command, request_key, throttle
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_refills_over_time():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate_per_second=1.0, capacity=3, clock=clock)
+    assert all(buckets.consume("u") for _ in range(3))
+    assert not buckets.consume("u")
+    clock.now = 1.0
+    assert buckets.consume("u")
+    assert not buckets.consume("u")
+
+
+def test_expensive_commands_cost_more():
+    buckets = TokenBuckets(rate_per_second=0.0, capacity=10, clock=FakeClock())
+    assert buckets.consume("u", cost=5)
+    assert buckets.consume("u", cost=5)
+    assert not buckets.consume("u", cost=1)
+
+
+def test_consume_all_is_atomic():
+    clock = FakeClock()
+    users = TokenBuckets(rate_per_second=0.0, capacity=10, clock=clock)
+    commands = TokenBuckets(rate_per_second=0.0, capacity=1, clock=clock)
+    assert consume_all([(users, "u", 2), (commands, ("u", "list_trips"), 1)])
+    assert not consume_all([(users, "u", 2), (commands, ("u", "list_trips"), 1)])
+    assert users.tokens("u") == 8
+
+
+def test_full_buckets_expire():
+    clock = FakeClock()
+    buckets = TokenBuckets(rate_per_second=1.0, capacity=2, sweep_interval=10, clock=clock)
+    for user in range(1000):
+        buckets.consume(user)
+    assert len(buckets) == 1000
+    clock.now = 11.0
+    buckets.consume("late")
+    assert len(buckets) == 1
+
+
+def test_coalescer_shares_in_flight_result():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["trip"]
+
+    async def scenario():
+        coalescer = Coalescer()
+        results = await asyncio.gather(*(coalescer.run(("list_trips",), fetch) for _ in range(50)))
+        assert not coalescer.is_in_flight(("list_trips",))
+        return results
+
+    assert asyncio.run(scenario()) == [["trip"]] * 50
+    assert len(calls) == 1
+
+
+def test_parse_command():
+    assert parse_command("/get_trip@CarpoolBot 42") == ("get_trip", ["42"])
+    assert parse_command("hello") == (None, [])
+    assert request_key("get_trip", ["42"]) == ("get_trip", "42")
+
+
+def make_update(text: str, user_id: int = 1):
+    update = MagicMock()
+    update.effective_user.id = user_id
+    update.effective_message.text = text
+    update.effective_message.reply_text = AsyncMock()
+    return update
+
+
+def test_throttle_replies_once_then_drops(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle_module, "user_buckets", TokenBuckets(0.0, 10, clock=clock))
+    monkeypatch.setattr(throttle_module, "command_buckets", TokenBuckets(0.0, 3, clock=clock))
+    monkeypatch.setattr(throttle_module, "notice_buckets", TokenBuckets(0.0, 1, clock=clock))
+    monkeypatch.setattr(throttle_module, "THROTTLE_COMMAND_COSTS", {"list_trips": 5})
+
+    update = make_update("/list_trips")
+    for _ in range(2):
+        asyncio.run(throttle(update, None))
+    for _ in range(3):
+        with pytest.raises(ApplicationHandlerStop):
+            asyncio.run(throttle(update, None))
+    update.effective_message.reply_text.assert_called_once_with(throttle_module.SLOW_DOWN_TEXT)
+
+
+def test_throttled_request_gets_shared_reply(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(throttle_module, "user_buckets", TokenBuckets(0.0, 0, clock=clock))
+    monkeypatch.setattr(throttle_module, "coalescer", Coalescer(ttl=5, clock=clock))
+    monkeypatch.setattr(throttle_module, "shared_replies", {})
+    throttle_module.share_reply("list_trips")
+    throttle_module.share_reply("admin_status", lambda user_id: user_id == 99)
+
+    async def scenario():
+        release = asyncio.Event()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "Available Trips:"
+
+        coalescer = throttle_module.coalescer
+        task = asyncio.ensure_future(coalescer.run(request_key("list_trips"), fetch))
+        await asyncio.sleep(0)
+
+        # Over limit, identical read in flight: answered from it, handler never runs
+        waiting = make_update("/list_trips foo")
+        joined = asyncio.ensure_future(throttle(waiting, None))
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(ApplicationHandlerStop):
+            await joined
+        waiting.effective_message.reply_text.assert_called_once_with("Available Trips:")
+        await task
+
+        # Just finished: served from the short-lived cache, still no new read
+        cached = make_update("/list_trips")
+        with pytest.raises(ApplicationHandlerStop):
+            await throttle(cached, None)
+        cached.effective_message.reply_text.assert_called_once_with("Available Trips:")
+        assert calls == [1]
+
+        # Cache expired: rejected with the slow-down reply
+        clock.now = 10
+        expired = make_update("/list_trips", user_id=2)
+        with pytest.raises(ApplicationHandlerStop):
+            await throttle(expired, None)
+        expired.effective_message.reply_text.assert_called_once_with(throttle_module.SLOW_DOWN_TEXT)
+
+        # Shared admin replies only go to admins
+        await coalescer.run(request_key("admin_status"), fetch)
+        outsider = make_update("/admin_status", user_id=3)
+        with pytest.raises(ApplicationHandlerStop):
+            await throttle(outsider, None)
+        outsider.effective_message.reply_text.assert_called_once_with(throttle_module.SLOW_DOWN_TEXT)
+
+    asyncio.run(scenario())
+
+
+def test_cost_above_burst_is_capped(monkeypatch):
+    monkeypatch.setattr(throttle_module, "THROTTLE_COMMAND_COSTS", {"admin_status": 50})
+    assert throttle_module.command_cost("admin_status") == throttle_module.THROTTLE_BURST
+    assert throttle_module.command_cost("help") == 1.0
+
+
+def test_request_key_ignores_args_of_argless_commands():
+    assert request_key("list_trips", ["foo"]) == request_key("list_trips")
+    assert request_key("get_trip", ["1"]) != request_key("get_trip", ["2"])
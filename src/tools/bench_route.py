@@ -0,0 +1,56 @@
+"""
+Benchmark the route optimiser on random multi-stop trips.
+
+Usage: python -m src.tools.bench_route [runs]
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from src.services.route import RoutePlan, distance_matrix
+
+
+def random_trip(stops: int, rng: random.Random):
+    start = datetime(2025, 6, 1, 17, 0)
+    pickup_points = [
+        {
+            "id": str(i),
+            "address": f"Stop {i}",
+            "lat": 52.37 + rng.uniform(-0.1, 0.1),
+            "lon": 4.89 + rng.uniform(-0.1, 0.1),
+            "time": (start + timedelta(minutes=rng.randint(0, 45))).isoformat(),
+        }
+        for i in range(stops)
+    ]
+    passengers = [
+        {"id": str(i), "lat": 52.37 + rng.uniform(-0.1, 0.1), "lon": 4.89 + rng.uniform(-0.1, 0.1)}
+        for i in range(stops)
+    ]
+    return pickup_points, passengers
+
+
+def bench(stops: int, runs: int, rng: random.Random):
+    full, incremental = [], []
+    for _ in range(runs):
+        pickup_points, passengers = random_trip(stops, rng)
+        distance_matrix.cache_clear()
+        begin = time.perf_counter()
+        plan = RoutePlan(pickup_points, seats=stops).solve(passengers[:-1])
+        full.append((time.perf_counter() - begin) * 1000)
+        begin = time.perf_counter()
+        plan.add_passenger(passengers[-1])
+        incremental.append((time.perf_counter() - begin) * 1000)
+    return statistics.median(full), max(full), statistics.median(incremental), max(incremental)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(42)
+    print(f"{'stops':>5} {'full p50 ms':>12} {'full max ms':>12} {'join p50 ms':>12} {'join max ms':>12}")
+    for stops in (5, 10, 15):
+        print(f"{stops:>5} " + " ".join(f"{value:>12.3f}" for value in bench(stops, runs, rng)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Stream users, trips and pickup points between Xata, a local SQLite file and NDJSON backups.
+
+Usage:
+    python -m src.tools.bulk export --table trips [--source xata|sqlite:PATH] [--output FILE]
+    python -m src.tools.bulk import --table trips [--target xata|sqlite:PATH] [--input FILE]
+
+Records are read page by page with cursor pagination and written in batched
+transactions, so memory use stays constant regardless of table size. Pass
+--checkpoint FILE to make an interrupted run resume where it stopped.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from xata.client import XataClient  # Use Xata client for database interactions
+from sentry_sdk import capture_exception
+from src.utils.xata_pages import query_pages, XATA_MAX_PAGE_SIZE
+
+TABLES = ("users", "trips", "pickup_points")
+XATA_MAX_TRANSACTION_OPS = 1000
+
+
+class XataStore:
+    """
+    Reads and writes a Xata table using cursor pagination and transactions.
+    """
+
+    def __init__(self, table: str):
+        self.table = table
+        self.xata = XataClient()
+
+    def read(self, cursor: str = None, page_size: int = XATA_MAX_PAGE_SIZE):
+        """
+        Yield (record, cursor) pairs, where cursor resumes after the record's page.
+        """
+        return query_pages(self.xata, self.table, cursor, page_size)
+
+    def write(self, records: list):
+        for start in range(0, len(records), XATA_MAX_TRANSACTION_OPS):
+            operations = [
+                {"insert": {"table": self.table, "record": record, "createOnly": False}}
+                for record in records[start:start + XATA_MAX_TRANSACTION_OPS]
+            ]
+            resp = self.xata.records().transaction({"operations": operations})
+            if not resp.is_success():
+                raise RuntimeError(f"Xata transaction on {self.table} failed: {resp}")
+
+
+class SQLiteStore:
+    """
+    Stores records of a table as JSON documents keyed by id in a local SQLite file.
+    """
+
+    def __init__(self, table: str, path: str):
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()  # SQLite allows a single writer at a time
+        self.conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        self.conn.commit()
+
+    def read(self, cursor: str = None, page_size: int = 1000):
+        """
+        Yield (record, cursor) pairs using keyset pagination on id.
+        """
+        cursor = cursor or ""
+        while True:
+            rows = self.conn.execute(
+                f'SELECT id, data FROM "{self.table}" WHERE id > ? ORDER BY id LIMIT ?', (cursor, page_size)
+            ).fetchall()
+            if not rows:
+                return
+            cursor = rows[-1][0]
+            for record_id, data in rows:
+                yield {"id": record_id, **json.loads(data)}, cursor
+            if len(rows) < page_size:
+                return
+
+    def write(self, records: list):
+        rows = [(str(r["id"]), json.dumps({k: v for k, v in r.items() if k != "id"})) for r in records]
+        with self.lock, self.conn:
+            self.conn.executemany(f'INSERT OR REPLACE INTO "{self.table}" (id, data) VALUES (?, ?)', rows)
+
+
+def open_store(spec: str, table: str):
+    if spec == "xata":
+        return XataStore(table)
+    if spec.startswith("sqlite:"):
+        return SQLiteStore(table, spec[len("sqlite:"):])
+    raise ValueError(f"Unknown store '{spec}', expected 'xata' or 'sqlite:PATH'")
+
+
+def load_checkpoint(path: str) -> dict:
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path: str, state: dict):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+class Progress:
+    """
+    Periodically reports record counts and throughput to stderr.
+    """
+
+    def __init__(self, label: str, start: int = 0, interval: float = 2.0, stream=None):
+        self.label = label
+        self.count = start
+        self._start_count = start
+        self._interval = interval
+        self._stream = stream
+        self._started = self._last = time.monotonic()
+
+    def add(self, n: int):
+        self.count += n
+        now = time.monotonic()
+        if now - self._last >= self._interval:
+            self._last = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        rate = (self.count - self._start_count) / elapsed
+        suffix = " done" if final else ""
+        print(f"{self.label}: {self.count} records, {rate:.0f} rec/s{suffix}", file=self._stream or sys.stderr)
+
+
+def export_table(store, out, checkpoint_path: str = None, page_size: int = XATA_MAX_PAGE_SIZE, progress: Progress = None):
+    """
+    Stream every record of `store` to `out` as NDJSON.
+
+    The checkpoint holds the cursor of the last fully written page and the
+    output offset after it. On resume a seekable `out` is truncated back to
+    that offset, so records from an interrupted page are not written twice.
+    A checkpoint of a finished export is ignored and the export starts over.
+    """
+    state = load_checkpoint(checkpoint_path)
+    if state.get("done"):
+        state = {}
+    cursor, count = state.get("cursor"), state.get("count", 0)
+    if out.seekable() and state.get("offset") is not None:
+        out.seek(state["offset"])
+        out.truncate()
+    progress = progress or Progress(f"export {store.table}", start=count)
+    page_cursor, pending = cursor, 0
+
+    def page_state():
+        out.flush()
+        return {"cursor": page_cursor, "count": count, "offset": out.tell() if out.seekable() else None}
+
+    for record, next_cursor in store.read(cursor, page_size):
+        if next_cursor != page_cursor and pending:
+            save_checkpoint(checkpoint_path, page_state())
+            progress.add(pending)
+            pending = 0
+        page_cursor = next_cursor
+        out.write(json.dumps(record, default=str) + "\n")
+        count += 1
+        pending += 1
+    save_checkpoint(checkpoint_path, {**page_state(), "done": True})
+    progress.add(pending)
+    progress.report(final=True)
+    return count
+
+
+def read_batches(lines, batch_size: int, skip: int = 0):
+    """
+    Yield (end_line, records) batches from NDJSON lines, skipping the first `skip` lines.
+    """
+    batch, line_no = [], 0
+    for line_no, line in enumerate(lines, start=1):
+        if line_no <= skip or not line.strip():
+            continue
+        batch.append(json.loads(line))
+        if len(batch) >= batch_size:
+            yield line_no, batch
+            batch = []
+    if batch:
+        yield line_no, batch
+
+
+def import_table(store, lines, checkpoint_path: str = None, batch_size: int = 500, concurrency: int = 4, progress: Progress = None):
+    """
+    Write NDJSON records to `store` in batches with at most `concurrency` batches in flight.
+
+    The checkpoint holds the last input line below which every batch has been
+    committed, so a resumed import skips work that is known to be done.
+    """
+    state = load_checkpoint(checkpoint_path)
+    committed = state.get("line", 0)
+    progress = progress or Progress(f"import {store.table}", start=state.get("count", 0))
+    in_flight = {}  # future -> (end_line, size)
+    finished = {}  # end_line -> size, for batches completed out of order
+    order = []  # end lines of submitted batches in input order
+
+    def drain(block_until):
+        nonlocal committed
+        done, _ = wait(in_flight, return_when=block_until)
+        for future in done:
+            end_line, size = in_flight.pop(future)
+            future.result()  # Re-raise write failures
+            finished[end_line] = size
+        while order and order[0] in finished:
+            end_line = order.pop(0)
+            committed = end_line
+            progress.add(finished.pop(end_line))
+        save_checkpoint(checkpoint_path, {"line": committed, "count": progress.count})
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            for end_line, batch in read_batches(lines, batch_size, skip=committed):
+                if len(in_flight) >= concurrency:
+                    drain(FIRST_COMPLETED)
+                in_flight[executor.submit(store.write, batch)] = (end_line, len(batch))
+                order.append(end_line)
+            while in_flight:
+                drain(FIRST_COMPLETED)
+        except Exception as e:
+            capture_exception(e)
+            raise
+    progress.report(final=True)
+    return progress.count
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m src.tools.bulk", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = commands.add_parser("export", help="Stream a table to NDJSON")
+    export_cmd.add_argument("--table", choices=TABLES, required=True)
+    export_cmd.add_argument("--source", default="xata", help="'xata' or 'sqlite:PATH' (default: xata)")
+    export_cmd.add_argument("--output", default="-", help="NDJSON file to write, '-' for stdout")
+    export_cmd.add_argument("--page-size", type=int, default=XATA_MAX_PAGE_SIZE)
+    export_cmd.add_argument("--checkpoint", help="Checkpoint file for resumable exports")
+
+    import_cmd = commands.add_parser("import", help="Load NDJSON records into a table")
+    import_cmd.add_argument("--table", choices=TABLES, required=True)
+    import_cmd.add_argument("--target", default="xata", help="'xata' or 'sqlite:PATH' (default: xata)")
+    import_cmd.add_argument("--input", default="-", help="NDJSON file to read, '-' for stdin")
+    import_cmd.add_argument("--batch-size", type=int, default=500)
+    import_cmd.add_argument("--concurrency", type=int, default=4)
+    import_cmd.add_argument("--checkpoint", help="Checkpoint file for resumable imports")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        state = load_checkpoint(args.checkpoint)
+        resuming = bool(state.get("cursor")) and not state.get("done")
+        if resuming and args.output != "-" and not os.path.exists(args.output):
+            parser.error(f"checkpoint {args.checkpoint} resumes into {args.output}, which does not exist; "
+                         "restore the partial file or delete the checkpoint")
+        store = open_store(args.source, args.table)
+        if args.output == "-":
+            export_table(store, sys.stdout, args.checkpoint, args.page_size)
+        else:
+            with open(args.output, "r+" if resuming else "w") as out:
+                export_table(store, out, args.checkpoint, args.page_size)
+    else:
+        store = open_store(args.target, args.table)
+        if args.input == "-":
+            import_table(store, sys.stdin, args.checkpoint, args.batch_size, args.concurrency)
+        else:
+            with open(args.input) as lines:
+                import_table(store, lines, args.checkpoint, args.batch_size, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
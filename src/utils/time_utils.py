@@ -0,0 +1,22 @@
+from datetime import datetime
+
+
+def parse_time(value):
+    """
+    Parse an ISO-8601 timestamp into a naive UTC datetime.
+
+    Args:
+        value: The timestamp string (e.g., "2025-06-01T18:00:00Z"), or None.
+
+    Returns:
+        datetime | None: The parsed time, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
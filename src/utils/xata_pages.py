@@ -0,0 +1,31 @@
+XATA_MAX_PAGE_SIZE = 200
+
+
+def query_pages(xata, table: str, cursor: str = None, page_size: int = XATA_MAX_PAGE_SIZE, filter: dict = None):
+    """
+    Read a Xata table page by page using cursor pagination.
+
+    Args:
+        xata: The XataClient to query with.
+        table (str): The table name (e.g., "trips").
+        cursor (str): Cursor to resume after, or None to start at the beginning.
+        page_size (int): Records per page, capped at Xata's maximum of 200.
+        filter (dict): Optional Xata filter (e.g., {"status": "active"}).
+
+    Yields:
+        tuple: (record, cursor) pairs, where cursor resumes after the record's page.
+    """
+    page_size = min(page_size, XATA_MAX_PAGE_SIZE)
+    while True:
+        page = {"size": page_size, "after": cursor} if cursor else {"size": page_size}
+        # The cursor already encodes the filter, so it is only sent with the first page
+        query = {"page": page, "filter": filter} if filter and not cursor else {"page": page}
+        resp = xata.data().query(table, query)
+        if not resp.is_success():
+            raise RuntimeError(f"Xata query on {table} failed: {resp}")
+        cursor = resp["meta"]["page"]["cursor"]
+        for record in resp["records"]:
+            record.pop("xata", None)
+            yield record, cursor
+        if not resp["meta"]["page"]["more"]:
+            return